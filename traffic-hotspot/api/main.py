@@ -7,15 +7,26 @@ Loads trained models and provides REST API endpoints for the frontend.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from datetime import datetime
+from functools import lru_cache
+import anyio.to_thread
 import pandas as pd
 import numpy as np
 import joblib
+import orjson
 import os
 from typing import List, Dict, Any
 import logging
 
+# Optional: runs forests compiled by ml/train.py (falls back to the joblib models)
+try:
+    import tl2cgen
+except ImportError:
+    tl2cgen = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -36,12 +47,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses; the per-segment prediction JSON repeats the same keys
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Global variables to store loaded models and data
 models = {}
 encoder = None
 metadata = {}
 road_segments_data = None
 
+# Request-invariant arrays derived from the fixed road segment list
+segment_ids = None
+segment_id_list = []
+segment_lat = []
+segment_lon = []
+segment_names = []
+X_encoded_static = None
+congestion_labels = None
+
+class CompiledForest:
+    """
+    Wraps a Treelite/TL2cgen-compiled forest with the predict() interface of the joblib models.
+    """
+    
+    def __init__(self, libpath: str, classes: np.ndarray = None):
+        self.predictor = tl2cgen.Predictor(libpath, nthread=1)  # single-threaded, like the joblib models
+        self.classes = classes  # set for classifiers: maps the argmax column to the class code
+    
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        output = self.predictor.predict(tl2cgen.DMatrix(X)).reshape(len(X), -1)
+        if self.classes is not None:
+            return self.classes[output.argmax(axis=1)]
+        return output[:, 0]
+
 class PredictionRequest(BaseModel):
     """Request model for traffic predictions."""
     datetime: str = Field(
@@ -71,6 +109,8 @@ def load_models_and_data():
     Load trained models, encoder, and metadata on startup.
     """
     global models, encoder, metadata, road_segments_data
+    global segment_ids, segment_id_list, segment_lat, segment_lon, segment_names, X_encoded_static
+    global congestion_labels
     
     try:
         models_dir = "../ml/models"
@@ -79,9 +119,26 @@ def load_models_and_data():
         logger.info("Loading trained models...")
         models['classifier'] = joblib.load(os.path.join(models_dir, "rf_congestion_cls.joblib"))
         models['regressor'] = joblib.load(os.path.join(models_dir, "rf_volume_reg.joblib"))
-        encoder = joblib.load(os.path.join(models_dir, "onehot_encoder.joblib"))
+        encoder = joblib.load(os.path.join(models_dir, "ordinal_encoder.joblib"))
         metadata = joblib.load(os.path.join(models_dir, "training_metadata.joblib"))
         
+        # The classifier predicts int8 codes; this maps them back to 'Low'/'Medium'/'High'
+        congestion_labels = np.array(metadata['class_labels'])
+        
+        # LightGBM's n_jobs is OpenMP threads over rows; a request predicts only one row per
+        # segment, and concurrency comes from the two-model fan-out and concurrent requests,
+        # so a single thread per predict avoids oversubscribing the cores
+        for model in models.values():
+            model.n_jobs = 1
+        
+        # Prefer natively compiled forests when train.py exported them
+        cls_lib = os.path.join(models_dir, "rf_congestion_cls.so")
+        reg_lib = os.path.join(models_dir, "rf_volume_reg.so")
+        if tl2cgen is not None and os.path.exists(cls_lib) and os.path.exists(reg_lib):
+            models['classifier'] = CompiledForest(cls_lib, classes=models['classifier'].classes_)
+            models['regressor'] = CompiledForest(reg_lib)
+            logger.info("Using compiled forests for inference")
+        
         logger.info("Models loaded successfully!")
         logger.info(f"Classification model: {type(models['classifier'])}")
         logger.info(f"Regression model: {type(models['regressor'])}")
@@ -89,15 +146,40 @@ def load_models_and_data():
         
         # Load road segments data for location mapping
         logger.info("Loading road segments data...")
-        data_path = "../data/processed/svc_clean_2022_2024.csv"
-        df = pd.read_csv(data_path)
+        segments_path = os.path.join(models_dir, "road_segments.parquet")
+        if os.path.exists(segments_path):
+            # Precomputed by train.py: a few hundred rows instead of the full dataset
+            road_segments_data = pd.read_parquet(segments_path)
+        else:
+            logger.warning(f"{segments_path} not found, deriving road segments from the cleaned data")
+            data_path = "../data/processed/svc_clean_2022_2024.parquet"
+            segment_columns = ['centreline_id', 'location_name', 'longitude', 'latitude']
+            df = pd.read_parquet(data_path, columns=segment_columns)
+            
+            # Get unique road segments with their coordinates and names
+            road_segments_data = (
+                df.drop_duplicates(subset='centreline_id', keep='first')
+                .sort_values('centreline_id')
+                .reset_index(drop=True)
+            )
+        
+        # Native Python values for assembling responses without touching pandas
+        segment_ids = road_segments_data['centreline_id'].to_numpy()
+        segment_id_list = segment_ids.tolist()
+        segment_lat = road_segments_data['latitude'].astype(float).tolist()
+        segment_lon = road_segments_data['longitude'].astype(float).tolist()
+        segment_names = road_segments_data['location_name'].tolist()
+        
+        # The segment list is fixed, so its encoded centreline_id column never changes between requests
+        X_encoded_static = encoder.transform(segment_ids.reshape(-1, 1)).astype(np.float32)
+        
+        # Warm up: run one prediction per model so first-call setup is paid at startup, not by the first request
+        X_warmup = prepare_features_for_prediction(0, 0, 0, 0)[:1]
+        for model in models.values():
+            model.predict(X_warmup)
         
-        # Get unique road segments with their coordinates and names
-        road_segments_data = df.groupby('centreline_id').agg({
-            'location_name': 'first',
-            'longitude': 'first', 
-            'latitude': 'first'
-        }).reset_index()
+        # Cached predictions are only valid for the models loaded above
+        predict_time_bucket.cache_clear()
         
         logger.info(f"Loaded {len(road_segments_data)} unique road segments")
         logger.info(f"Date range in training data: {metadata['date_range']['start']} to {metadata['date_range']['end']}")
@@ -108,54 +190,80 @@ def load_models_and_data():
         logger.error(f"Failed to load models: {str(e)}")
         return False
 
-def prepare_features_for_prediction(dt: datetime) -> pd.DataFrame:
+def extract_time_features(dt: datetime) -> tuple:
     """
-    Prepare feature matrix for prediction at given datetime.
+    Extract the (hour, day_of_week, month, is_weekend) features from a datetime.
     """
-    # Extract time features
     hour = dt.hour
     day_of_week = dt.weekday()  # 0=Monday, 6=Sunday
     month = dt.month
     is_weekend = 1 if day_of_week in [5, 6] else 0  # Saturday=5, Sunday=6
     
-    # Create features for all road segments
-    features_list = []
-    for _, row in road_segments_data.iterrows():
-        centreline_id = row['centreline_id']
-        features_list.append({
-            'hour': hour,
-            'day_of_week': day_of_week,
-            'month': month,
-            'is_weekend': is_weekend,
-            'centreline_id': centreline_id
-        })
+    return hour, day_of_week, month, is_weekend
+
+def prepare_features_for_prediction(hour: int, day_of_week: int, month: int, is_weekend: int) -> np.ndarray:
+    """
+    Prepare feature matrix for prediction at given time features.
+    
+    Returns a new dense (N, 5) C-contiguous float32 matrix, the dtype the forests
+    predict on, so concurrent requests never share a buffer.
+    """
+    X = np.empty((len(X_encoded_static), 4 + X_encoded_static.shape[1]), dtype=np.float32)
     
-    # Convert to DataFrame
-    features_df = pd.DataFrame(features_list)
+    # Broadcast the time features across all road segments
+    # (same column order as training: hour, day_of_week, month, is_weekend)
+    X[:, :4] = [hour, day_of_week, month, is_weekend]
+    X[:, 4:] = X_encoded_static
     
-    # Separate numerical and categorical features (same as training)
-    numerical_features = ['hour', 'day_of_week', 'month', 'is_weekend']
-    categorical_features = ['centreline_id']
+    return X
+
+@lru_cache(maxsize=4096)
+def predict_time_bucket(hour: int, day_of_week: int, month: int, is_weekend: int) -> List[Dict[str, Any]]:
+    """
+    Predict all road segments for one time bucket.
     
-    # Extract numerical features
-    X_numerical = features_df[numerical_features].copy()
+    Predictions depend only on the four time features (at most 24*7*12*2 buckets),
+    so results are memoized until the models are reloaded.
+    """
+    X_processed = prepare_features_for_prediction(hour, day_of_week, month, is_weekend)
     
-    # OneHotEncode centreline_id
-    X_encoded = encoder.transform(features_df[categorical_features])
+    # Make predictions: both forests traverse the same X concurrently while it is cache-hot
+    congestion_predictions, vehicle_predictions = joblib.Parallel(n_jobs=2, prefer='threads')(
+        joblib.delayed(model.predict)(X_processed)
+        for model in (models['classifier'], models['regressor'])
+    )
     
-    # Get feature names for encoded data
-    encoded_feature_names = [f"centreline_{id}" for id in encoder.categories_[0]]
-    X_encoded_df = pd.DataFrame(X_encoded, columns=encoded_feature_names, index=features_df.index)
+    # Map class codes to labels and round vehicle predictions to integers
+    # (native Python values for orjson)
+    congestion_levels = congestion_labels[congestion_predictions].tolist()
+    vehicle_counts = np.round(vehicle_predictions).astype(int).tolist()
     
-    # Combine numerical and encoded features
-    X_processed = pd.concat([X_numerical, X_encoded_df], axis=1)
+    # Create response
+    predictions = [
+        {
+            'centreline_id': centreline_id,
+            'location_name': location_name,
+            'longitude': longitude,
+            'latitude': latitude,
+            'congestion_level': congestion_level,
+            'predicted_vehicles': predicted_vehicles
+        }
+        for centreline_id, location_name, longitude, latitude, congestion_level, predicted_vehicles
+        in zip(segment_id_list, segment_names, segment_lon, segment_lat, congestion_levels, vehicle_counts)
+    ]
     
-    return X_processed
+    return predictions
 
 @app.on_event("startup")
 async def startup_event():
     """Load models and data when the application starts."""
     logger.info("Starting Toronto Traffic Hotspot API...")
+    
+    # Sync endpoints run in AnyIO's threadpool; allow at least two threads per core so
+    # cache misses for different time buckets predict concurrently
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, (os.cpu_count() or 1) * 2)
+    
     success = load_models_and_data()
     if not success:
         logger.error("Failed to load models. API may not work correctly.")
@@ -178,11 +286,17 @@ async def health_check():
         road_segments_count=road_segments_count
     )
 
-@app.post("/predict_at", response_model=List[PredictionResponse])
-async def predict_traffic_at_time(request: PredictionRequest):
+@app.post(
+    "/predict_at",
+    responses={200: {"model": List[PredictionResponse]}}  # documented only, not validated per row
+)
+def predict_traffic_at_time(request: PredictionRequest):
     """
     Predict traffic congestion and vehicle counts for all road segments at a specific time.
     
+    Declared sync so FastAPI runs the CPU-bound model inference in its threadpool
+    instead of blocking the event loop.
+    
     Args:
         request: Contains datetime string for prediction
         
@@ -208,30 +322,12 @@ async def predict_traffic_at_time(request: PredictionRequest):
         
         logger.info(f"Making predictions for datetime: {dt}")
         
-        # Prepare features for all road segments
-        X_processed = prepare_features_for_prediction(dt)
-        
-        # Make predictions
-        congestion_predictions = models['classifier'].predict(X_processed)
-        vehicle_predictions = models['regressor'].predict(X_processed)
-        
-        # Round vehicle predictions to integers
-        vehicle_predictions = np.round(vehicle_predictions).astype(int)
-        
-        # Create response
-        predictions = []
-        for i, (_, row) in enumerate(road_segments_data.iterrows()):
-            predictions.append(PredictionResponse(
-                centreline_id=int(row['centreline_id']),
-                location_name=row['location_name'],
-                longitude=float(row['longitude']),
-                latitude=float(row['latitude']),
-                congestion_level=congestion_predictions[i],
-                predicted_vehicles=int(vehicle_predictions[i])
-            ))
+        # Predict all road segments for this time bucket (cached)
+        predictions = predict_time_bucket(*extract_time_features(dt))
         
         logger.info(f"Generated {len(predictions)} predictions")
-        return predictions
+        # Serialize the cached rows with orjson directly, skipping FastAPI's response encoding
+        return Response(orjson.dumps(predictions), media_type="application/json")
         
     except HTTPException:
         raise
@@ -271,6 +367,7 @@ async def get_model_info():
         "regression_r2": metadata.get('regression_r2'),
         "feature_columns": metadata.get('feature_columns'),
         "classification_target": metadata.get('classification_target'),
+        "class_labels": metadata.get('class_labels'),
         "regression_target": metadata.get('regression_target')
     }
 
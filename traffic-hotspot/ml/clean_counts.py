@@ -8,6 +8,33 @@ import numpy as np
 from datetime import datetime
 import os
 
+# Copy-on-write: column selections and filters share data until they are modified
+pd.set_option('mode.copy_on_write', True)
+
+# Keywords identifying each column role, since raw column names vary between exports
+COLUMN_KEYWORDS = {
+    'date': ('date', 'time', 'datetime'),
+    'vehicle': ('vehicle', 'auto'),
+    'cyclist': ('cyclist', 'bike'),
+    'pedestrian': ('pedestrian', 'ped', 'walk'),
+    'latitude': ('lat',),
+    'longitude': ('lon', 'lng'),
+}
+
+def find_columns(columns):
+    """
+    Map each role in COLUMN_KEYWORDS to the first column whose name contains one of its keywords.
+    Roles with no matching column map to None.
+    """
+    found = dict.fromkeys(COLUMN_KEYWORDS)
+    for col in columns:
+        col_lower = col.lower()
+        for role, keywords in COLUMN_KEYWORDS.items():
+            if found[role] is None and any(keyword in col_lower for keyword in keywords):
+                found[role] = col
+                break
+    return found
+
 def clean_counts_data():
     """
     Clean the intersection count dataset.
@@ -16,25 +43,26 @@ def clean_counts_data():
     
     # Check if raw data exists
     raw_file = "../data/raw/comptages_vehicules_cyclistes_pietons.csv"
-    if not os.path.exists(raw_file):
+    demo_file = "../data/raw/comptages_vehicules_cyclistes_pietons.parquet"  # from scripts/generate_demo_data.py
+    if not os.path.exists(raw_file) and not os.path.exists(demo_file):
         print(f"❌ Raw data file not found: {raw_file}")
         print("Please download comptages_vehicules_cyclistes_pietons.csv from Toronto Open Data")
         print("and place it in the data/raw/ directory.")
         return
     
     print("📊 Loading intersection count data...")
-    df = pd.read_csv(raw_file)
+    if os.path.exists(raw_file):
+        df = pd.read_csv(raw_file, engine='pyarrow')  # multithreaded Arrow parser
+    else:
+        df = pd.read_parquet(demo_file)
     print(f"   Loaded {len(df)} records")
     
     # Display basic info about the dataset
     print(f"   Columns: {list(df.columns)}")
     
-    # Find date column (could be named differently)
-    date_col = None
-    for col in df.columns:
-        if any(keyword in col.lower() for keyword in ['date', 'time', 'datetime']):
-            date_col = col
-            break
+    # Find date, count and coordinate columns (could be named differently) in one pass
+    columns = find_columns(df.columns)
+    date_col = columns['date']
     
     if not date_col:
         print("   ⚠️  No date column found, creating dummy dates")
@@ -45,83 +73,58 @@ def clean_counts_data():
     print(f"   Date range: {df['date'].min()} to {df['date'].max()}")
     
     # Filter for 2022-2024 data only
-    df_clean = df[(df['date'].dt.year >= 2022) & (df['date'].dt.year <= 2024)].copy()
+    # Compare raw datetime64 values against [2022-01-01, 2025-01-01) instead of extracting .dt.year
+    datetime_values = df['date'].values
+    in_range = (datetime_values >= np.datetime64('2022-01-01')) & (datetime_values < np.datetime64('2025-01-01'))
+    df_clean = df.loc[in_range].reset_index(drop=True)
+    del df  # release the unfiltered raw data
     print(f"   Filtered to 2022-2024: {len(df_clean)} records")
     
     # Create time-based features
-    df_clean['year'] = df_clean['date'].dt.year
-    df_clean['month'] = df_clean['date'].dt.month
-    df_clean['day_of_week'] = df_clean['date'].dt.dayofweek
-    df_clean['hour'] = df_clean['date'].dt.hour
-    df_clean['is_weekend'] = df_clean['day_of_week'].isin([5, 6]).astype(int)
-    
-    # Find vehicle, cyclist, and pedestrian count columns
-    vehicle_col = None
-    cyclist_col = None
-    pedestrian_col = None
-    
-    for col in df_clean.columns:
-        col_lower = col.lower()
-        if 'vehicle' in col_lower or 'auto' in col_lower:
-            vehicle_col = col
-        elif 'cyclist' in col_lower or 'bike' in col_lower:
-            cyclist_col = col
-        elif 'pedestrian' in col_lower or 'ped' in col_lower or 'walk' in col_lower:
-            pedestrian_col = col
+    # Small-range features are stored as compact integers
+    timestamps = df_clean['date'].dt
+    df_clean['year'] = timestamps.year.astype(np.int16)
+    df_clean['month'] = timestamps.month.astype(np.int8)
+    df_clean['day_of_week'] = timestamps.dayofweek.astype(np.int8)
+    df_clean['hour'] = timestamps.hour.astype(np.int8)
+    df_clean['is_weekend'] = (df_clean['day_of_week'].to_numpy() >= 5).astype(np.int8)  # Saturday=5, Sunday=6
+    
+    # Assemble vehicle, cyclist, and pedestrian counts in one block (missing columns count as 0)
+    counts = np.column_stack([
+        df_clean[col].to_numpy(dtype=float, na_value=0.0) if col else np.zeros(len(df_clean))
+        for col in (columns['vehicle'], columns['cyclist'], columns['pedestrian'])
+    ])
+    df_clean[['vehicle_count', 'cyclist_count', 'pedestrian_count']] = counts
     
     # Create total traffic count
-    total_count = 0
-    if vehicle_col:
-        total_count += df_clean[vehicle_col].fillna(0)
-        df_clean['vehicle_count'] = df_clean[vehicle_col].fillna(0)
-    else:
-        df_clean['vehicle_count'] = 0
-    
-    if cyclist_col:
-        total_count += df_clean[cyclist_col].fillna(0)
-        df_clean['cyclist_count'] = df_clean[cyclist_col].fillna(0)
-    else:
-        df_clean['cyclist_count'] = 0
-    
-    if pedestrian_col:
-        total_count += df_clean[pedestrian_col].fillna(0)
-        df_clean['pedestrian_count'] = df_clean[pedestrian_col].fillna(0)
-    else:
-        df_clean['pedestrian_count'] = 0
-    
-    df_clean['total_count'] = total_count
+    df_clean['total_count'] = counts.sum(axis=1)
     
     # Create congestion level categories based on total traffic
     if df_clean['total_count'].sum() > 0:
         p33 = df_clean['total_count'].quantile(0.33)
         p66 = df_clean['total_count'].quantile(0.66)
         
-        def categorize_congestion(count):
-            if count <= p33:
-                return 'Low'
-            elif count <= p66:
-                return 'Medium'
-            else:
-                return 'High'
-        
-        df_clean['congestion_level'] = df_clean['total_count'].apply(categorize_congestion)
+        # Vectorized bucketing: <= p33 -> Low, <= p66 -> Medium, else High
+        congestion_labels = np.array(['Low', 'Medium', 'High'])
+        bucket = np.searchsorted([p33, p66], df_clean['total_count'].to_numpy(), side='left')
+        df_clean['congestion_level'] = congestion_labels[bucket]
         print(f"   Created congestion levels: {df_clean['congestion_level'].value_counts().to_dict()}")
     else:
         print("   ⚠️  No traffic count data found, creating dummy congestion levels")
         df_clean['congestion_level'] = 'Medium'  # Default value
     
     # Handle location data
-    lat_cols = [col for col in df_clean.columns if 'lat' in col.lower()]
-    lon_cols = [col for col in df_clean.columns if 'lon' in col.lower() or 'lng' in col.lower()]
+    lat_col = columns['latitude']
+    lon_col = columns['longitude']
     
-    if not lat_cols or not lon_cols:
+    if not lat_col or not lon_col:
         print("   ⚠️  No lat/lon columns found, creating dummy coordinates for Toronto intersections")
         # Create realistic Toronto intersection coordinates
         df_clean['latitude'] = 43.6532 + np.random.normal(0, 0.2, len(df_clean))
         df_clean['longitude'] = -79.3832 + np.random.normal(0, 0.2, len(df_clean))
     else:
-        df_clean['latitude'] = df_clean[lat_cols[0]]
-        df_clean['longitude'] = df_clean[lon_cols[0]]
+        df_clean['latitude'] = df_clean[lat_col]
+        df_clean['longitude'] = df_clean[lon_col]
     
     # Handle missing values
     df_clean = df_clean.dropna(subset=['date'])
@@ -138,11 +141,11 @@ def clean_counts_data():
         if col not in ml_columns and any(keyword in col.lower() for keyword in ['speed', 'volume', 'density', 'intersection']):
             ml_columns.append(col)
     
-    df_final = df_clean[ml_columns].copy()
+    df_final = df_clean[ml_columns]
     
     # Save cleaned data
-    output_file = "../data/processed/counts_clean_2022_2024.csv"
-    df_final.to_csv(output_file, index=False)
+    output_file = "../data/processed/counts_clean_2022_2024.parquet"
+    df_final.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
     
     print(f"✅ Cleaned intersection data saved to: {output_file}")
     print(f"   Final dataset: {len(df_final)} records, {len(df_final.columns)} columns")
@@ -8,6 +8,22 @@ import numpy as np
 from datetime import datetime
 import os
 
+# Copy-on-write: column selections and filters share data until they are modified
+pd.set_option('mode.copy_on_write', True)
+
+# Individual vehicle type count columns in the raw SVC export
+VEHICLE_COLUMNS = [
+    'vol_fwha1_motorbike', 'vol_fwha2_cars', 'vol_fwha3_pickups', 
+    'vol_fwha4_buses', 'vol_fwha5', 'vol_fwha6', 'vol_fwha7', 
+    'vol_fwha8', 'vol_fwha9', 'vol_fwha10', 'vol_fwha11', 'vol_fwha12', 'vol_fwha13'
+]
+
+# Only these raw columns are used; the rest of the export is never parsed
+RAW_COLUMNS = ['time_start', 'centreline_id', 'location_name', 'longitude', 'latitude'] + VEHICLE_COLUMNS
+
+# Counts are read straight into float32 (NaN-capable) instead of being inferred as int64/float64
+RAW_DTYPES = {col: 'float32' for col in VEHICLE_COLUMNS}
+
 def clean_svc_data():
     """
     Clean the SVC (road segment) dataset.
@@ -16,74 +32,69 @@ def clean_svc_data():
     
     # Check if raw data exists
     raw_file = "../data/raw/svc_raw_data_class_2020_2024.csv"
-    if not os.path.exists(raw_file):
+    demo_file = "../data/raw/svc_raw_data_class_2020_2024.parquet"  # from scripts/generate_demo_data.py
+    if not os.path.exists(raw_file) and not os.path.exists(demo_file):
         print(f"ERROR: Raw data file not found: {raw_file}")
         print("Please download svc_raw_data_class_2020_2024.csv from Toronto Open Data")
         print("and place it in the data/raw/ directory.")
         return
     
     print("Loading SVC raw data...")
-    df = pd.read_csv(raw_file)
+    if os.path.exists(raw_file):
+        # Multithreaded Arrow parser; time_start is parsed to datetime while reading
+        df = pd.read_csv(raw_file, engine='pyarrow', usecols=RAW_COLUMNS, dtype=RAW_DTYPES,
+                         parse_dates=['time_start'])
+    else:
+        df = pd.read_parquet(demo_file, columns=RAW_COLUMNS)
     print(f"   Loaded {len(df)} records")
     
     # Display basic info about the dataset
     print(f"   Columns: {list(df.columns)}")
     
-    # Convert time columns to datetime
-    df['time_start'] = pd.to_datetime(df['time_start'])
-    df['time_end'] = pd.to_datetime(df['time_end'])
-    
     # Use time_start as our primary datetime column
     df['datetime'] = df['time_start']
     
     print(f"   Date range: {df['datetime'].min()} to {df['datetime'].max()}")
     
     # Filter for 2022-2024 data only
-    df_clean = df[(df['datetime'].dt.year >= 2022) & (df['datetime'].dt.year <= 2024)].copy()
+    # Compare raw datetime64 values against [2022-01-01, 2025-01-01) instead of extracting .dt.year
+    datetime_values = df['datetime'].values
+    in_range = (datetime_values >= np.datetime64('2022-01-01')) & (datetime_values < np.datetime64('2025-01-01'))
+    df_clean = df.loc[in_range].reset_index(drop=True)
+    del df  # release the unfiltered raw data
     print(f"   Filtered to 2022-2024: {len(df_clean)} records")
     
     # Create time-based features
-    df_clean['year'] = df_clean['datetime'].dt.year
-    df_clean['month'] = df_clean['datetime'].dt.month
-    df_clean['day_of_week'] = df_clean['datetime'].dt.dayofweek
-    df_clean['hour'] = df_clean['datetime'].dt.hour
-    df_clean['is_weekend'] = df_clean['day_of_week'].isin([5, 6]).astype(int)
+    # Small-range features are stored as compact integers
+    timestamps = df_clean['datetime'].dt
+    df_clean['year'] = timestamps.year.astype(np.int16)
+    df_clean['month'] = timestamps.month.astype(np.int8)
+    df_clean['day_of_week'] = timestamps.dayofweek.astype(np.int8)
+    df_clean['hour'] = timestamps.hour.astype(np.int8)
+    df_clean['is_weekend'] = (df_clean['day_of_week'].to_numpy() >= 5).astype(np.int8)  # Saturday=5, Sunday=6
     
     # Calculate total vehicle count from individual vehicle type columns
-    vehicle_columns = [
-        'vol_fwha1_motorbike', 'vol_fwha2_cars', 'vol_fwha3_pickups', 
-        'vol_fwha4_buses', 'vol_fwha5', 'vol_fwha6', 'vol_fwha7', 
-        'vol_fwha8', 'vol_fwha9', 'vol_fwha10', 'vol_fwha11', 'vol_fwha12', 'vol_fwha13'
-    ]
-    
-    # Fill NaN values with 0 for vehicle counts
-    for col in vehicle_columns:
-        if col in df_clean.columns:
-            df_clean[col] = df_clean[col].fillna(0)
+    # Read all vehicle counts in one pass, with NaN values filled as 0
+    vehicle_counts = df_clean[VEHICLE_COLUMNS].to_numpy(dtype=np.float32, na_value=0.0)
     
     # Calculate total vehicles
-    df_clean['total_vehicles'] = df_clean[vehicle_columns].sum(axis=1)
+    df_clean['total_vehicles'] = vehicle_counts.sum(axis=1)
     
     # Create individual vehicle type counts for better ML features
-    df_clean['cars'] = df_clean['vol_fwha2_cars'].fillna(0)
-    df_clean['buses'] = df_clean['vol_fwha4_buses'].fillna(0)
-    df_clean['trucks'] = df_clean['vol_fwha3_pickups'].fillna(0)  # Using pickups as trucks
-    df_clean['motorcycles'] = df_clean['vol_fwha1_motorbike'].fillna(0)
+    df_clean['cars'] = vehicle_counts[:, VEHICLE_COLUMNS.index('vol_fwha2_cars')]
+    df_clean['buses'] = vehicle_counts[:, VEHICLE_COLUMNS.index('vol_fwha4_buses')]
+    df_clean['trucks'] = vehicle_counts[:, VEHICLE_COLUMNS.index('vol_fwha3_pickups')]  # Using pickups as trucks
+    df_clean['motorcycles'] = vehicle_counts[:, VEHICLE_COLUMNS.index('vol_fwha1_motorbike')]
     
     # Create congestion level categories based on total vehicle counts
     # Use percentiles to create Low/Medium/High categories
     p33 = df_clean['total_vehicles'].quantile(0.33)
     p66 = df_clean['total_vehicles'].quantile(0.66)
     
-    def categorize_congestion(count):
-        if count <= p33:
-            return 'Low'
-        elif count <= p66:
-            return 'Medium'
-        else:
-            return 'High'
-    
-    df_clean['congestion_level'] = df_clean['total_vehicles'].apply(categorize_congestion)
+    # Vectorized bucketing: <= p33 -> Low, <= p66 -> Medium, else High
+    congestion_labels = np.array(['Low', 'Medium', 'High'])
+    bucket = np.searchsorted([p33, p66], df_clean['total_vehicles'].to_numpy(), side='left')
+    df_clean['congestion_level'] = congestion_labels[bucket]
     print(f"   Created congestion levels: {df_clean['congestion_level'].value_counts().to_dict()}")
     
     # Handle missing values
@@ -109,14 +120,14 @@ def clean_svc_data():
         'cars', 'buses', 'trucks', 'motorcycles', 'total_vehicles', 'congestion_level'
     ]
     
-    df_final = df_clean[ml_columns].copy()
+    df_final = df_clean[ml_columns]
     
     # Sort by datetime for better organization
     df_final = df_final.sort_values('datetime').reset_index(drop=True)
     
     # Save cleaned data
-    output_file = "../data/processed/svc_clean_2022_2024.csv"
-    df_final.to_csv(output_file, index=False)
+    output_file = "../data/processed/svc_clean_2022_2024.parquet"
+    df_final.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
     
     print(f"SUCCESS: Cleaned SVC data saved to: {output_file}")
     print(f"   Final dataset: {len(df_final)} records, {len(df_final.columns)} columns")
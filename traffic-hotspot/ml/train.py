@@ -2,8 +2,11 @@
 Machine Learning Training Script for Toronto Traffic Hotspot Prediction.
 
 Trains two models:
-1. RandomForestClassifier for congestion level prediction (Low/Medium/High)
-2. RandomForestRegressor for vehicle count prediction
+1. Random forest classifier for congestion level prediction (Low/Medium/High)
+2. Random forest regressor for vehicle count prediction
+
+Both forests are trained with LightGBM's histogram-based 'rf' boosting mode,
+which bins features instead of sorting them for every split search.
 
 Features: hour, day_of_week, month, is_weekend, centreline_id
 Targets: congestion_level (classification), total_vehicles (regression)
@@ -11,14 +14,62 @@ Targets: congestion_level (classification), total_vehicles (regression)
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.model_selection import train_test_split, StratifiedShuffleSplit
+from lightgbm import LGBMClassifier, LGBMRegressor
+import pyarrow.parquet as pq
+from sklearn.preprocessing import OrdinalEncoder
 from sklearn.metrics import accuracy_score, classification_report, mean_absolute_error, r2_score
 import joblib
+import gc
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Congestion classes, indexed by the int8 code the classifier is trained on
+CONGESTION_LABELS = ['Low', 'Medium', 'High']
+
+# Shared LightGBM random forest settings. Each tree sees a 30% bootstrap subsample,
+# each split considers a random half of the features (like sklearn's per-split
+# max_features), and trees are kept shallow with large leaves, which bounds fit
+# time, memory and model size on large datasets.
+FOREST_PARAMS = {
+    'boosting_type': 'rf',
+    'n_estimators': 100,
+    'max_depth': 16,
+    'num_leaves': 1024,
+    'min_child_samples': 20,
+    'bagging_freq': 1,
+    'bagging_fraction': 0.3,
+    'feature_fraction': 1.0,  # per-tree sampling would hide features from whole trees
+    'feature_fraction_bynode': 0.5,  # resampled at every split, ~sqrt of the 5 features
+    'random_state': 42,
+    'n_jobs': -1,
+    'verbose': -1
+}
+
+def gain_importance(model):
+    """
+    Split-gain feature importances, normalized to sum to 1.
+    """
+    importance = model.booster_.feature_importance(importance_type='gain')
+    total = importance.sum()
+    return importance / total if total > 0 else importance
+
+def rank_importance(model, feature_names, report, k=10):
+    """
+    Rank features by normalized gain importance and add the top k to the report lines.
+    Returns (feature, importance) pairs, most important first; the DataFrame is only built at save time.
+    """
+    importance = gain_importance(model)
+    order = np.argsort(-importance, kind='stable')
+    ranked = [(feature_names[i], float(importance[i])) for i in order]
+    
+    report.append(f"\nTop {k} Most Important Features:")
+    for feature, value in ranked[:k]:
+        report.append(f"   {feature}: {value:.4f}")
+    
+    return ranked
+
 def load_and_prepare_data():
     """
     Load the cleaned SVC data and prepare features and targets.
@@ -26,36 +77,66 @@ def load_and_prepare_data():
     print("Loading cleaned SVC data...")
     
     # Load cleaned data
-    data_path = "../data/processed/svc_clean_2022_2024.csv"
+    data_path = "../data/processed/svc_clean_2022_2024.parquet"
     if not os.path.exists(data_path):
         raise FileNotFoundError(f"Cleaned data not found at {data_path}. Please run clean_svc.py first.")
     
-    df = pd.read_csv(data_path)
-    print(f"   Loaded {len(df)} records")
-    
-    # Convert datetime to proper format
-    df['datetime'] = pd.to_datetime(df['datetime'])
-    
     # Define features and targets
     feature_columns = ['hour', 'day_of_week', 'month', 'is_weekend', 'centreline_id']
     classification_target = 'congestion_level'
     regression_target = 'total_vehicles'
     
+    # Read only the columns used for training and metadata with Arrow's multithreaded
+    # reader; Parquet preserves dtypes, so datetime is already parsed
+    segment_columns = ['location_name', 'longitude', 'latitude']
+    table = pq.read_table(
+        data_path,
+        columns=feature_columns + [classification_target, regression_target, 'datetime'] + segment_columns,
+        use_threads=True
+    )
+    
+    # One block per column skips pandas' block consolidation copy, and self_destruct
+    # frees each Arrow column as soon as it has been converted
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    print(f"   Loaded {len(df)} records")
+    
     # Extract features and targets
     X = df[feature_columns].copy()
-    y_classification = df[classification_target]
-    y_regression = df[regression_target]
+    # Train on int8 class codes instead of object strings
+    y_classification = pd.Categorical(df[classification_target], categories=CONGESTION_LABELS).codes
+    # LightGBM stores labels as float32, so convert once here (no-op for the cleaned float32 column)
+    y_regression = np.ascontiguousarray(df[regression_target].to_numpy(dtype=np.float32))
     
     print(f"   Features: {feature_columns}")
     print(f"   Classification target: {classification_target}")
     print(f"   Regression target: {regression_target}")
     print(f"   Unique centreline_ids: {X['centreline_id'].nunique()}")
     
-    return X, y_classification, y_regression, df
+    # Keep only the small summaries needed later, so the full DataFrame can be freed
+    # before training
+    data_info = {
+        # Shape of the cleaned dataset, not of the column subset read above
+        'shape': (len(df), len(pq.read_schema(data_path).names)),
+        'start': str(df['datetime'].min()),
+        'end': str(df['datetime'].max()),
+        'unique_locations': X['centreline_id'].nunique(),
+        'road_segments': (
+            df[['centreline_id', 'location_name', 'longitude', 'latitude']]
+            .drop_duplicates(subset='centreline_id', keep='first')
+            .sort_values('centreline_id')
+            .reset_index(drop=True)
+        )
+    }
+    
+    return X, y_classification, y_regression, data_info
 
 def preprocess_features(X):
     """
-    Preprocess features: OneHotEncode centreline_id, keep numerical features as-is.
+    Preprocess features: encode centreline_id as an integer code, keep numerical features as-is.
+    
+    Trees split on the integer code directly, so the feature matrix stays at
+    5 columns instead of 4 + one column per centreline_id.
     """
     print("Preprocessing features...")
     
@@ -63,105 +144,95 @@ def preprocess_features(X):
     numerical_features = ['hour', 'day_of_week', 'month', 'is_weekend']
     categorical_features = ['centreline_id']
     
-    # Extract numerical features
-    X_numerical = X[numerical_features].copy()
-    
-    # OneHotEncode centreline_id
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-    X_encoded = encoder.fit_transform(X[categorical_features])
+    # Integer-code centreline_id with a hash-based factorize (sorted, so codes match
+    # OrdinalEncoder's). The encoder saved for inference is fitted on the unique ids only
+    # and maps unseen ids to -1.
+    codes, unique_ids = pd.factorize(X['centreline_id'], sort=True)
+    encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
+    encoder.fit(np.asarray(unique_ids).reshape(-1, 1))
     
-    # Get feature names for encoded data
-    encoded_feature_names = [f"centreline_{id}" for id in encoder.categories_[0]]
-    X_encoded_df = pd.DataFrame(X_encoded, columns=encoded_feature_names, index=X.index)
-    
-    # Combine numerical and encoded features
-    X_processed = pd.concat([X_numerical, X_encoded_df], axis=1)
+    # Write straight into one C-contiguous float32 matrix, so fit does not allocate
+    # a converted duplicate and no intermediate stacked copies are made
+    feature_names = numerical_features + categorical_features
+    X_processed = np.empty((len(X), len(feature_names)), dtype=np.float32)
+    X_processed[:, :len(numerical_features)] = X[numerical_features].to_numpy()
+    X_processed[:, len(numerical_features)] = codes
     
     print(f"   Numerical features: {numerical_features}")
-    print(f"   Encoded centreline_ids: {len(encoded_feature_names)} unique IDs")
+    print(f"   Encoded centreline_ids: {len(encoder.categories_[0])} unique IDs")
     print(f"   Final feature matrix shape: {X_processed.shape}")
     
-    return X_processed, encoder
+    return X_processed, feature_names, encoder
 
-def train_classification_model(X, y):
+def train_classification_model(X, y, feature_names, n_jobs=-1):
     """
-    Train RandomForestClassifier for congestion level prediction.
+    Train random forest classifier for congestion level prediction.
+    Progress and results are collected as report text, returned last.
     """
-    print("\n" + "="*50)
-    print("TRAINING CLASSIFICATION MODEL (Congestion Level)")
-    print("="*50)
+    report = []
+    report.append("\n" + "="*50)
+    report.append("TRAINING CLASSIFICATION MODEL (Congestion Level)")
+    report.append("="*50)
     
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    # Stratified split: compute the index arrays once (only the labels are needed),
+    # then take rows with a single fancy-index per set
+    splitter = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+    train_idx, test_idx = next(splitter.split(np.zeros(len(y)), y))
+    X_train, X_test = X[train_idx], X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
     
-    print(f"Training set: {X_train.shape[0]} samples")
-    print(f"Test set: {X_test.shape[0]} samples")
-    
-    # Train RandomForestClassifier
-    print("Training RandomForestClassifier...")
-    clf = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=20,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        n_jobs=-1
-    )
+    report.append(f"Training set: {X_train.shape[0]} samples")
+    report.append(f"Test set: {X_test.shape[0]} samples")
     
-    clf.fit(X_train, y_train)
+    # Train random forest classifier (centreline_id is handled as a native categorical)
+    report.append("Training LGBMClassifier (random forest mode)...")
+    clf = LGBMClassifier(**{**FOREST_PARAMS, 'n_jobs': n_jobs})
+    
+    # Categorical column passed by index: the models are fitted and queried with plain
+    # ndarrays, so no feature names are stored (feature_names is only used for reporting)
+    clf.fit(X_train, y_train, categorical_feature=[feature_names.index('centreline_id')])
     
     # Make predictions
     y_pred = clf.predict(X_test)
     
     # Evaluate model
     accuracy = accuracy_score(y_test, y_pred)
-    print(f"\nClassification Results:")
-    print(f"   Accuracy: {accuracy:.4f}")
-    print(f"\nClassification Report:")
-    print(classification_report(y_test, y_pred))
+    report.append(f"\nClassification Results:")
+    report.append(f"   Accuracy: {accuracy:.4f}")
+    report.append(f"\nClassification Report:")
+    report.append(classification_report(y_test, y_pred, labels=range(len(CONGESTION_LABELS)), target_names=CONGESTION_LABELS))
     
     # Feature importance
-    feature_importance = pd.DataFrame({
-        'feature': X.columns,
-        'importance': clf.feature_importances_
-    }).sort_values('importance', ascending=False)
-    
-    print(f"\nTop 10 Most Important Features:")
-    print(feature_importance.head(10))
+    feature_importance = rank_importance(clf, feature_names, report)
     
-    return clf, accuracy, feature_importance
+    return clf, accuracy, feature_importance, "\n".join(report)
 
-def train_regression_model(X, y):
+def train_regression_model(X, y, feature_names, n_jobs=-1):
     """
-    Train RandomForestRegressor for vehicle count prediction.
+    Train random forest regressor for vehicle count prediction.
+    Progress and results are collected as report text, returned last.
     """
-    print("\n" + "="*50)
-    print("TRAINING REGRESSION MODEL (Vehicle Count)")
-    print("="*50)
+    report = []
+    report.append("\n" + "="*50)
+    report.append("TRAINING REGRESSION MODEL (Vehicle Count)")
+    report.append("="*50)
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
     
-    print(f"Training set: {X_train.shape[0]} samples")
-    print(f"Test set: {X_test.shape[0]} samples")
-    print(f"Target range: {y.min()} to {y.max()} vehicles")
-    
-    # Train RandomForestRegressor
-    print("Training RandomForestRegressor...")
-    reg = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=20,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        n_jobs=-1
-    )
+    report.append(f"Training set: {X_train.shape[0]} samples")
+    report.append(f"Test set: {X_test.shape[0]} samples")
+    report.append(f"Target range: {y.min()} to {y.max()} vehicles")
+    
+    # Train random forest regressor (centreline_id is handled as a native categorical)
+    report.append("Training LGBMRegressor (random forest mode)...")
+    reg = LGBMRegressor(**{**FOREST_PARAMS, 'n_jobs': n_jobs})
     
-    reg.fit(X_train, y_train)
+    # Categorical column passed by index: the models are fitted and queried with plain
+    # ndarrays, so no feature names are stored (feature_names is only used for reporting)
+    reg.fit(X_train, y_train, categorical_feature=[feature_names.index('centreline_id')])
     
     # Make predictions
     y_pred = reg.predict(X_test)
@@ -170,23 +241,81 @@ def train_regression_model(X, y):
     mae = mean_absolute_error(y_test, y_pred)
     r2 = r2_score(y_test, y_pred)
     
-    print(f"\nRegression Results:")
-    print(f"   Mean Absolute Error: {mae:.4f}")
-    print(f"   R² Score: {r2:.4f}")
+    report.append(f"\nRegression Results:")
+    report.append(f"   Mean Absolute Error: {mae:.4f}")
+    report.append(f"   R² Score: {r2:.4f}")
     
     # Feature importance
-    feature_importance = pd.DataFrame({
-        'feature': X.columns,
-        'importance': reg.feature_importances_
-    }).sort_values('importance', ascending=False)
+    feature_importance = rank_importance(reg, feature_names, report)
     
-    print(f"\nTop 10 Most Important Features:")
-    print(feature_importance.head(10))
-    
-    return reg, mae, r2, feature_importance
+    return reg, mae, r2, feature_importance, "\n".join(report)
+
+# Compiled forest libraries written by export_compiled_models and loaded by the API as a pair
+COMPILED_MODEL_FILES = ["rf_congestion_cls.so", "rf_volume_reg.so"]
+
+# Trees per generated C file. Splitting by tree count (not core count) keeps each gcc
+# invocation small on any machine; one huge file can take gcc gigabytes and many minutes.
+COMPILE_TREES_PER_UNIT = 10
+
+# -O1 compiles about twice as fast as TL2cgen's default -O3 with the same prediction speed
+# (the generated code is plain if/else trees); gcc uses the last -O flag given
+COMPILE_OPTIONS = ['-O1']
+
+def remove_compiled_models(models_dir):
+    """
+    Delete compiled forests from a previous training run, so the API never pairs them
+    with newly saved joblib models.
+    """
+    for filename in COMPILED_MODEL_FILES:
+        libpath = os.path.join(models_dir, filename)
+        if os.path.exists(libpath):
+            os.remove(libpath)
+
+def export_compiled_models(clf, reg, models_dir):
+    """
+    Compile both forests into native shared libraries with Treelite/TL2cgen.
+    The API prefers these over the joblib models when present; joblib remains the fallback.
+    Runs last, since compiling large forests can take many minutes.
+    """
+    try:
+        import treelite
+        import tl2cgen
+    except ImportError:
+        print("   Compiled models skipped (install treelite and tl2cgen to enable)")
+        return
+    
+    print("   Compiling forests to native code (a few minutes, Ctrl+C skips)...")
+    compiled_paths = [
+        (model, os.path.join(models_dir, filename))
+        for model, filename in zip((clf, reg), COMPILED_MODEL_FILES)
+    ]
+    temp_paths = []
+    try:
+        # Build under temporary names, then move both into place only once both compiled
+        for model, libpath in compiled_paths:
+            temp_path = os.path.splitext(libpath)[0] + ".tmp.so"
+            temp_paths.append(temp_path)
+            tl_model = treelite.frontend.from_lightgbm(model.booster_)
+            n_units = max(1, -(-model.booster_.num_trees() // COMPILE_TREES_PER_UNIT))
+            # quantize compares integer bin indices instead of float thresholds: same predictions,
+            # ~30% smaller libraries and faster traversal. Compile cost is bounded by the unit split.
+            tl2cgen.export_lib(tl_model, toolchain='gcc', libpath=temp_path,
+                               params={'parallel_comp': n_units, 'quantize': 1},
+                               options=COMPILE_OPTIONS)
+        for (_, libpath), temp_path in zip(compiled_paths, temp_paths):
+            os.replace(temp_path, libpath)
+            print(f"   Compiled model: {libpath}")
+    except KeyboardInterrupt:
+        print("   Model compilation interrupted, API will use joblib models")
+    except Exception as e:
+        print(f"   WARNING: Model compilation failed, API will use joblib models: {str(e)}")
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
 def save_models_and_metadata(clf, reg, encoder, clf_accuracy, reg_mae, reg_r2, 
-                           clf_importance, reg_importance, df):
+                           clf_importance, reg_importance, data_info):
     """
     Save trained models and metadata to ml/models/ directory.
     """
@@ -198,10 +327,13 @@ def save_models_and_metadata(clf, reg, encoder, clf_accuracy, reg_mae, reg_r2,
     models_dir = "models"
     os.makedirs(models_dir, exist_ok=True)
     
+    # Drop the previous run's compiled forests before any new artifact is written
+    remove_compiled_models(models_dir)
+    
     # Save models
     clf_path = os.path.join(models_dir, "rf_congestion_cls.joblib")
     reg_path = os.path.join(models_dir, "rf_volume_reg.joblib")
-    encoder_path = os.path.join(models_dir, "onehot_encoder.joblib")
+    encoder_path = os.path.join(models_dir, "ordinal_encoder.joblib")
     
     joblib.dump(clf, clf_path)
     joblib.dump(reg, reg_path)
@@ -210,22 +342,29 @@ def save_models_and_metadata(clf, reg, encoder, clf_accuracy, reg_mae, reg_r2,
     print(f"SUCCESS: Models saved:")
     print(f"   Classification model: {clf_path}")
     print(f"   Regression model: {reg_path}")
-    print(f"   OneHotEncoder: {encoder_path}")
+    print(f"   OrdinalEncoder: {encoder_path}")
+    
+    # Save the unique road segments so the API does not need to parse the full dataset
+    segments_path = os.path.join(models_dir, "road_segments.parquet")
+    road_segments = data_info['road_segments']
+    road_segments.to_parquet(segments_path, index=False)
+    print(f"   Road segments: {segments_path} ({len(road_segments)} segments)")
     
     # Save metadata
     metadata = {
         'training_date': datetime.now().isoformat(),
-        'data_shape': df.shape,
+        'data_shape': data_info['shape'],
         'date_range': {
-            'start': str(df['datetime'].min()),
-            'end': str(df['datetime'].max())
+            'start': data_info['start'],
+            'end': data_info['end']
         },
-        'unique_locations': df['centreline_id'].nunique(),
+        'unique_locations': data_info['unique_locations'],
         'classification_accuracy': clf_accuracy,
         'regression_mae': reg_mae,
         'regression_r2': reg_r2,
         'feature_columns': ['hour', 'day_of_week', 'month', 'is_weekend', 'centreline_id'],
         'classification_target': 'congestion_level',
+        'class_labels': CONGESTION_LABELS,
         'regression_target': 'total_vehicles'
     }
     
@@ -234,10 +373,16 @@ def save_models_and_metadata(clf, reg, encoder, clf_accuracy, reg_mae, reg_r2,
     print(f"   Training metadata: {metadata_path}")
     
     # Save feature importance
-    clf_importance.to_csv(os.path.join(models_dir, "clf_feature_importance.csv"), index=False)
-    reg_importance.to_csv(os.path.join(models_dir, "reg_feature_importance.csv"), index=False)
+    importance_columns = ['feature', 'importance']
+    pd.DataFrame(clf_importance, columns=importance_columns).to_csv(
+        os.path.join(models_dir, "clf_feature_importance.csv"), index=False)
+    pd.DataFrame(reg_importance, columns=importance_columns).to_csv(
+        os.path.join(models_dir, "reg_feature_importance.csv"), index=False)
     print(f"   Feature importance files saved")
     
+    # Compile the forests for faster inference (optional, after every other artifact is saved)
+    export_compiled_models(clf, reg, models_dir)
+    
     return metadata
 
 def main():
@@ -249,21 +394,37 @@ def main():
     
     try:
         # Load and prepare data
-        X, y_classification, y_regression, df = load_and_prepare_data()
+        X, y_classification, y_regression, data_info = load_and_prepare_data()
         
         # Preprocess features
-        X_processed, encoder = preprocess_features(X)
+        X_processed, feature_names, encoder = preprocess_features(X)
         
-        # Train classification model
-        clf, clf_accuracy, clf_importance = train_classification_model(X_processed, y_classification)
+        # Free the raw feature frame before the memory-heavy training step
+        del X
+        gc.collect()
         
-        # Train regression model
-        reg, reg_mae, reg_r2, reg_importance = train_regression_model(X_processed, y_regression)
+        # Train classification and regression models concurrently, splitting the cores
+        # between them (a single forest does not saturate all cores). LightGBM releases
+        # the GIL while fitting, so threads overlap without copying the training data.
+        n_jobs = max(1, (os.cpu_count() or 2) // 2)
+        print("\nTraining classification and regression models...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            clf_future = executor.submit(
+                train_classification_model, X_processed, y_classification, feature_names, n_jobs
+            )
+            reg_future = executor.submit(
+                train_regression_model, X_processed, y_regression, feature_names, n_jobs
+            )
+            # Print each report whole, so the two models' output does not interleave
+            clf, clf_accuracy, clf_importance, clf_report = clf_future.result()
+            print(clf_report)
+            reg, reg_mae, reg_r2, reg_importance, reg_report = reg_future.result()
+            print(reg_report)
         
         # Save models and metadata
         metadata = save_models_and_metadata(
             clf, reg, encoder, clf_accuracy, reg_mae, reg_r2,
-            clf_importance, reg_importance, df
+            clf_importance, reg_importance, data_info
         )
         
         print("\n" + "="*60)
@@ -5,18 +5,113 @@ This creates sample datasets when real Toronto data is not available.
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
 import os
+import shutil
+
+# Demo data is generated and written one year at a time to bound peak memory
+DEMO_YEARS = (2022, 2023, 2024)
+
+# Share of each SVC vehicle class column in a segment's hourly count (cars take the remainder),
+# so the demo SVC data has the same schema as the raw Toronto export
+SVC_VEHICLE_SHARES = {
+    'vol_fwha1_motorbike': 0.01, 'vol_fwha3_pickups': 0.15, 'vol_fwha4_buses': 0.02,
+    'vol_fwha5': 0.04, 'vol_fwha6': 0.01, 'vol_fwha7': 0.005, 'vol_fwha8': 0.01,
+    'vol_fwha9': 0.03, 'vol_fwha10': 0.005, 'vol_fwha11': 0.005, 'vol_fwha12': 0.002, 'vol_fwha13': 0.001
+}
+
+def _time_multipliers(hours, days_of_week, months):
+    """
+    Compute vehicle, cyclist and pedestrian traffic multipliers for each timestamp.
+    Returns three float32 arrays shaped like the inputs.
+    """
+    # Time-of-day periods: morning rush, evening rush, night (otherwise regular hours)
+    time_periods = [
+        (hours >= 7) & (hours <= 9),
+        (hours >= 17) & (hours <= 19),
+        (hours >= 22) | (hours <= 5)
+    ]
+    weekend = days_of_week >= 5
+    seasons = [np.isin(months, [12, 1, 2]), np.isin(months, [6, 7, 8])]  # Winter, summer
+    
+    def multiplier(period_values, weekend_value, season_values):
+        mult = np.select(time_periods, period_values, default=1.0)
+        mult *= np.where(weekend, weekend_value, 1.0)
+        mult *= np.select(seasons, season_values, default=1.0)
+        return mult.astype(np.float32)
+    
+    vehicle_mult = multiplier([2.5, 2.2, 0.3], 0.7, [0.9, 1.1])
+    cyclist_mult = multiplier([1.8, 2.0, 0.1], 1.2, [0.3, 1.5])  # More cyclists on weekends and in summer
+    pedestrian_mult = multiplier([2.0, 2.2, 0.2], 1.3, [0.8, 1.2])  # More pedestrians on weekends
+    
+    return vehicle_mult, cyclist_mult, pedestrian_mult
+
+def _noise(rng, scale, size):
+    """
+    Draw float32 N(1, scale) noise in a single call (scale may be per-stream along the last axis).
+    """
+    noise = rng.standard_normal(size, dtype=np.float32)
+    noise *= np.asarray(scale, dtype=np.float32)
+    noise += 1
+    return noise
+
+def _noisy_counts(base, multiplier, noise):
+    """
+    Turn (n_dates, n_locations) noise into non-negative int32 counts, flattened with dates outermost.
+    The per-date base * multiplier is broadcast across locations and applied to noise in place,
+    so no per-row multiplier array is materialized.
+    """
+    noise *= (base * multiplier)[:, None]
+    counts = noise.astype(np.int32).ravel()
+    np.maximum(counts, 0, out=counts)
+    return counts
+
+def _year_dates(year):
+    """
+    Hourly timestamps covering one calendar year.
+    """
+    return pd.date_range(start=datetime(year, 1, 1), end=datetime(year, 12, 31, 23), freq='h')
+
+def _reset_dataset(path):
+    """
+    Remove a previous demo output (single file or partitioned directory), since
+    write_to_dataset adds files to existing partitions instead of replacing them.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def _write_year_partition(columns, path):
+    """
+    Append one year of rows to a Parquet dataset partitioned by year (path/year=YYYY/...).
+    columns maps column name to a NumPy array; Arrow wraps the arrays directly, without a DataFrame.
+    """
+    table = pa.table(columns)
+    pq.write_to_dataset(table, root_path=path, partition_cols=['year'], compression='zstd')
+    return table.num_rows
+
+def _svc_class_counts(vehicle_count):
+    """
+    Split total vehicle counts into the SVC vehicle class columns; the classes sum to the total.
+    """
+    class_counts = {
+        col: (vehicle_count * share).astype(np.int32) for col, share in SVC_VEHICLE_SHARES.items()
+    }
+    cars = vehicle_count.copy()
+    for counts in class_counts.values():
+        cars -= counts
+    return {'vol_fwha2_cars': cars, **class_counts}
 
 def generate_demo_svc_data():
-    """Generate demo SVC (road segment) data."""
+    """Generate demo SVC (road segment) data in the raw SVC export schema."""
     
     print("📊 Generating demo SVC data...")
     
-    # Create date range for 2022-2024
-    start_date = datetime(2022, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    dates = pd.date_range(start=start_date, end=end_date, freq='H')
+    # PCG64 generator, seeded so demo data is reproducible
+    rng = np.random.default_rng(42)
     
     # Create sample locations around Toronto
     toronto_center = (43.6532, -79.3832)
@@ -27,85 +122,63 @@ def generate_demo_svc_data():
             lon = toronto_center[1] + j * 0.03
             locations.append((lat, lon))
     
-    # Generate data for each location and time
-    data = []
-    for date in dates:
-        for lat, lon in locations:
-            # Create realistic traffic patterns
-            hour = date.hour
-            day_of_week = date.weekday()
-            
-            # Base traffic count with time patterns
-            base_count = 20
-            
-            # Rush hour multipliers
-            if 7 <= hour <= 9:  # Morning rush
-                multiplier = 2.5
-            elif 17 <= hour <= 19:  # Evening rush
-                multiplier = 2.2
-            elif 22 <= hour or hour <= 5:  # Night
-                multiplier = 0.3
-            else:  # Regular hours
-                multiplier = 1.0
-            
-            # Weekend reduction
-            if day_of_week >= 5:  # Weekend
-                multiplier *= 0.7
-            
-            # Seasonal variation
-            month = date.month
-            if month in [12, 1, 2]:  # Winter
-                multiplier *= 0.9
-            elif month in [6, 7, 8]:  # Summer
-                multiplier *= 1.1
-            
-            # Add some randomness
-            noise = np.random.normal(1, 0.2)
-            vehicle_count = max(0, int(base_count * multiplier * noise))
-            
-            # Create congestion level
-            if vehicle_count <= 30:
-                congestion_level = 'Low'
-            elif vehicle_count <= 60:
-                congestion_level = 'Medium'
-            else:
-                congestion_level = 'High'
-            
-            data.append({
-                'date': date,
-                'latitude': lat,
-                'longitude': lon,
-                'vehicle_count': vehicle_count,
-                'congestion_level': congestion_level
-            })
-    
-    df = pd.DataFrame(data)
-    
-    # Add time-based features
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['hour'] = df['date'].dt.hour
-    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    
-    # Save to raw data directory
-    output_file = "data/raw/svc_raw_data_class_2020_2024.csv"
-    df.to_csv(output_file, index=False)
+    # Base traffic count with time patterns
+    base_count = 20
+    
+    n_locations = len(locations)
+    lats, lons = np.array(locations).T
+    centreline_ids = np.arange(n_locations, dtype=np.int64) + 1000001
+    location_names = np.array([f"Demo Segment {i + 1}" for i in range(n_locations)])
+    
+    # Save to raw data directory as a dataset partitioned by year
+    output_file = "data/raw/svc_raw_data_class_2020_2024.parquet"
+    _reset_dataset(output_file)
+    
+    n_records = 0
+    for year in DEMO_YEARS:
+        dates = _year_dates(year)
+        
+        # Time features per hour (vectorized over the year's dates)
+        hours = dates.hour.values
+        days_of_week = dates.weekday.values
+        months = dates.month.values
+        multiplier, _, _ = _time_multipliers(hours, days_of_week, months)
+        
+        # Add some randomness (one bulk draw per year)
+        noise = _noise(rng, 0.2, (len(dates), n_locations))
+        vehicle_count = _noisy_counts(base_count, multiplier, noise)
+        
+        # Expand to one row per (date, location), dates outermost; clean_svc.py derives
+        # the time features, totals and congestion levels from these raw columns
+        time_start = np.repeat(dates.values, n_locations)
+        n_rows = len(time_start)
+        columns = {
+            'time_start': time_start,
+            'time_end': time_start + np.timedelta64(1, 'h'),
+            'centreline_id': np.tile(centreline_ids, len(dates)),
+            'location_name': np.tile(location_names, len(dates)),
+            'latitude': np.tile(lats, len(dates)),
+            'longitude': np.tile(lons, len(dates)),
+            **_svc_class_counts(vehicle_count),
+            # Partition key only
+            'year': np.full(n_rows, year, dtype=np.int16)
+        }
+        
+        n_records += _write_year_partition(columns, output_file)
+        del columns, noise, vehicle_count, time_start  # free this year before generating the next
     
     print(f"✅ Demo SVC data saved to: {output_file}")
-    print(f"   Generated {len(df)} records for {len(locations)} locations")
+    print(f"   Generated {n_records} records for {len(locations)} locations")
     
-    return df
+    return n_records
 
 def generate_demo_counts_data():
     """Generate demo intersection count data."""
     
     print("📊 Generating demo intersection count data...")
     
-    # Create date range for 2022-2024
-    start_date = datetime(2022, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    dates = pd.date_range(start=start_date, end=end_date, freq='H')
+    # PCG64 generator, seeded so demo data is reproducible
+    rng = np.random.default_rng(42)
     
     # Create sample intersection locations
     toronto_center = (43.6532, -79.3832)
@@ -116,97 +189,66 @@ def generate_demo_counts_data():
             lon = toronto_center[1] + j * 0.05
             intersections.append((lat, lon))
     
-    # Generate data for each intersection and time
-    data = []
-    for date in dates:
-        for lat, lon in intersections:
-            # Create realistic traffic patterns
-            hour = date.hour
-            day_of_week = date.weekday()
-            
-            # Base counts for different vehicle types
-            base_vehicles = 25
-            base_cyclists = 5
-            base_pedestrians = 10
-            
-            # Time-based multipliers
-            if 7 <= hour <= 9:  # Morning rush
-                vehicle_mult = 2.5
-                cyclist_mult = 1.8
-                pedestrian_mult = 2.0
-            elif 17 <= hour <= 19:  # Evening rush
-                vehicle_mult = 2.2
-                cyclist_mult = 2.0
-                pedestrian_mult = 2.2
-            elif 22 <= hour or hour <= 5:  # Night
-                vehicle_mult = 0.3
-                cyclist_mult = 0.1
-                pedestrian_mult = 0.2
-            else:  # Regular hours
-                vehicle_mult = 1.0
-                cyclist_mult = 1.0
-                pedestrian_mult = 1.0
-            
-            # Weekend patterns
-            if day_of_week >= 5:  # Weekend
-                vehicle_mult *= 0.7
-                cyclist_mult *= 1.2  # More cyclists on weekends
-                pedestrian_mult *= 1.3  # More pedestrians on weekends
-            
-            # Seasonal variation
-            month = date.month
-            if month in [12, 1, 2]:  # Winter
-                vehicle_mult *= 0.9
-                cyclist_mult *= 0.3  # Fewer cyclists in winter
-                pedestrian_mult *= 0.8
-            elif month in [6, 7, 8]:  # Summer
-                vehicle_mult *= 1.1
-                cyclist_mult *= 1.5  # More cyclists in summer
-                pedestrian_mult *= 1.2
-            
-            # Add randomness
-            vehicle_count = max(0, int(base_vehicles * vehicle_mult * np.random.normal(1, 0.2)))
-            cyclist_count = max(0, int(base_cyclists * cyclist_mult * np.random.normal(1, 0.3)))
-            pedestrian_count = max(0, int(base_pedestrians * pedestrian_mult * np.random.normal(1, 0.25)))
-            
-            total_count = vehicle_count + cyclist_count + pedestrian_count
-            
-            # Create congestion level
-            if total_count <= 40:
-                congestion_level = 'Low'
-            elif total_count <= 80:
-                congestion_level = 'Medium'
-            else:
-                congestion_level = 'High'
-            
-            data.append({
-                'date': date,
-                'latitude': lat,
-                'longitude': lon,
-                'vehicle_count': vehicle_count,
-                'cyclist_count': cyclist_count,
-                'pedestrian_count': pedestrian_count,
-                'total_count': total_count,
-                'congestion_level': congestion_level
-            })
-    
-    df = pd.DataFrame(data)
-    
-    # Add time-based features
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['hour'] = df['date'].dt.hour
-    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    
-    # Save to raw data directory
-    output_file = "data/raw/comptages_vehicules_cyclistes_pietons.csv"
-    df.to_csv(output_file, index=False)
+    # Base counts for different vehicle types
+    base_vehicles = 25
+    base_cyclists = 5
+    base_pedestrians = 10
+    
+    n_intersections = len(intersections)
+    lats, lons = np.array(intersections).T
+    
+    # Save to raw data directory as a dataset partitioned by year
+    output_file = "data/raw/comptages_vehicules_cyclistes_pietons.parquet"
+    _reset_dataset(output_file)
+    
+    n_records = 0
+    for year in DEMO_YEARS:
+        dates = _year_dates(year)
+        
+        # Time features per hour (vectorized over the year's dates)
+        hours = dates.hour.values
+        days_of_week = dates.weekday.values
+        months = dates.month.values
+        vehicle_mult, cyclist_mult, pedestrian_mult = _time_multipliers(hours, days_of_week, months)
+        
+        # Add randomness (one bulk draw per year for all three streams)
+        noise = _noise(rng, [0.2, 0.3, 0.25], (len(dates), n_intersections, 3))
+        vehicle_count = _noisy_counts(base_vehicles, vehicle_mult, noise[..., 0])
+        cyclist_count = _noisy_counts(base_cyclists, cyclist_mult, noise[..., 1])
+        pedestrian_count = _noisy_counts(base_pedestrians, pedestrian_mult, noise[..., 2])
+        
+        total_count = vehicle_count + cyclist_count + pedestrian_count
+        
+        # Create congestion level
+        congestion_level = np.select([total_count <= 40, total_count <= 80], ['Low', 'Medium'], default='High')
+        
+        # Expand to one row per (date, intersection), dates outermost
+        day_of_week = np.repeat(days_of_week, n_intersections)
+        n_rows = len(day_of_week)
+        columns = {
+            'date': np.repeat(dates.values, n_intersections),
+            'latitude': np.tile(lats, len(dates)),
+            'longitude': np.tile(lons, len(dates)),
+            'vehicle_count': vehicle_count,
+            'cyclist_count': cyclist_count,
+            'pedestrian_count': pedestrian_count,
+            'total_count': total_count,
+            'congestion_level': congestion_level,
+            # Time-based features
+            'year': np.full(n_rows, year, dtype=np.int16),
+            'month': np.repeat(months, n_intersections),
+            'day_of_week': day_of_week,
+            'hour': np.repeat(hours, n_intersections),
+            'is_weekend': (day_of_week >= 5).astype(int)
+        }
+        
+        n_records += _write_year_partition(columns, output_file)
+        del columns, noise, vehicle_count, cyclist_count, pedestrian_count, total_count, congestion_level  # free this year before generating the next
     
     print(f"✅ Demo intersection data saved to: {output_file}")
-    print(f"   Generated {len(df)} records for {len(intersections)} intersections")
+    print(f"   Generated {n_records} records for {len(intersections)} intersections")
     
-    return df
+    return n_records
 
 def main():
     """Generate demo data for testing."""
@@ -219,8 +261,8 @@ def main():
     os.makedirs("data/processed", exist_ok=True)
     
     # Generate demo datasets
-    svc_data = generate_demo_svc_data()
-    counts_data = generate_demo_counts_data()
+    generate_demo_svc_data()
+    generate_demo_counts_data()
     
     print("\n✅ Demo data generation completed!")
     print("\nNext steps:")
@@ -63,21 +63,23 @@ Write-Host "✅ Data directories created" -ForegroundColor Green
 
 # Check if raw data files exist
 Write-Host "📊 Checking for raw data files..." -ForegroundColor Blue
-if (-not (Test-Path "data\raw\svc_raw_data_class_2020_2024.csv")) {
+if (-not (Test-Path "data\raw\svc_raw_data_class_2020_2024.csv") -and -not (Test-Path "data\raw\svc_raw_data_class_2020_2024.parquet")) {
     Write-Host "⚠️  SVC data file not found: data\raw\svc_raw_data_class_2020_2024.csv" -ForegroundColor Yellow
     Write-Host "   Please download it from Toronto Open Data Portal and place it in data\raw\" -ForegroundColor Yellow
+    Write-Host "   (or generate demo data: python scripts\generate_demo_data.py)" -ForegroundColor Yellow
 }
 
-if (-not (Test-Path "data\raw\comptages_vehicules_cyclistes_pietons.csv")) {
+if (-not (Test-Path "data\raw\comptages_vehicules_cyclistes_pietons.csv") -and -not (Test-Path "data\raw\comptages_vehicules_cyclistes_pietons.parquet")) {
     Write-Host "⚠️  Intersection data file not found: data\raw\comptages_vehicules_cyclistes_pietons.csv" -ForegroundColor Yellow
     Write-Host "   Please download it from Toronto Open Data Portal and place it in data\raw\" -ForegroundColor Yellow
+    Write-Host "   (or generate demo data: python scripts\generate_demo_data.py)" -ForegroundColor Yellow
 }
 
 Write-Host ""
 Write-Host "🎉 Setup completed successfully!" -ForegroundColor Green
 Write-Host ""
 Write-Host "Next steps:" -ForegroundColor Cyan
-Write-Host "1. Download the raw data files from Toronto Open Data Portal" -ForegroundColor White
+Write-Host "1. Download the raw data files from Toronto Open Data Portal (or run: python scripts\generate_demo_data.py)" -ForegroundColor White
 Write-Host "2. Run: python ml\clean_svc.py" -ForegroundColor White
 Write-Host "3. Run: python ml\clean_counts.py" -ForegroundColor White
 Write-Host "4. Run: python ml\train.py" -ForegroundColor White
@@ -53,21 +53,23 @@ echo "✅ Data directories created"
 
 # Check if raw data files exist
 echo "📊 Checking for raw data files..."
-if [ ! -f "data/raw/svc_raw_data_class_2020_2024.csv" ]; then
+if [ ! -f "data/raw/svc_raw_data_class_2020_2024.csv" ] && [ ! -e "data/raw/svc_raw_data_class_2020_2024.parquet" ]; then
     echo "⚠️  SVC data file not found: data/raw/svc_raw_data_class_2020_2024.csv"
     echo "   Please download it from Toronto Open Data Portal and place it in data/raw/"
+    echo "   (or generate demo data: python scripts/generate_demo_data.py)"
 fi
 
-if [ ! -f "data/raw/comptages_vehicules_cyclistes_pietons.csv" ]; then
+if [ ! -f "data/raw/comptages_vehicules_cyclistes_pietons.csv" ] && [ ! -e "data/raw/comptages_vehicules_cyclistes_pietons.parquet" ]; then
     echo "⚠️  Intersection data file not found: data/raw/comptages_vehicules_cyclistes_pietons.csv"
     echo "   Please download it from Toronto Open Data Portal and place it in data/raw/"
+    echo "   (or generate demo data: python scripts/generate_demo_data.py)"
 fi
 
 echo ""
 echo "🎉 Setup completed successfully!"
 echo ""
 echo "Next steps:"
-echo "1. Download the raw data files from Toronto Open Data Portal"
+echo "1. Download the raw data files from Toronto Open Data Portal (or run: python scripts/generate_demo_data.py)"
 echo "2. Run: python ml/clean_svc.py"
 echo "3. Run: python ml/clean_counts.py"
 echo "4. Run: python ml/train.py"